@@ -21,7 +21,41 @@ class Settings(BaseSettings):
     
     # File Upload
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
-    ALLOWED_EXTENSIONS: set = {".py", ".zip"}
+    MAX_EXTRACTED_SIZE: int = 50 * 1024 * 1024  # 50MB of decompressed sources
+    
+    # Process pool for decompression/decoding (0 = run inline on the event loop)
+    CPU_POOL_WORKERS: int = 2
+    ALLOWED_EXTENSIONS: set = {".py", ".zip", ".tar", ".tar.gz", ".tgz", ".tar.xz", ".txz", ".bundle"}
+    
+    # Analysis deadlines (seconds) - clients may shorten via DEADLINE_HEADER
+    ANALYSIS_DEADLINE_SECONDS: float = 120.0
+    ANALYSIS_MAX_DEADLINE_SECONDS: float = 600.0
+    DEADLINE_HEADER: str = "X-Request-Timeout"
+    PROFILE_HEADER: str = "X-Profile"  # Admins may profile one request (or ?profile=true)
+    # Share of the deadline reserved for each pipeline stage
+    EXTRACTION_BUDGET_RATIO: float = 0.2
+    LLM_BUDGET_RATIO: float = 0.7
+    PERSISTENCE_BUDGET_RATIO: float = 0.1
+    LLM_FILES_PER_BATCH: int = 5
+    
+    # Rate limiting - token buckets per user, sized by tier
+    RATE_LIMIT_TIERS: dict = {
+        "free": {"requests_per_minute": 10, "llm_tokens_per_minute": 50_000},
+        "pro": {"requests_per_minute": 60, "llm_tokens_per_minute": 500_000},
+    }
+    RATE_LIMIT_DEFAULT_TIER: str = "free"
+    RATE_LIMIT_BACKEND: str = "memory"  # "memory" or "mongo" (shared across workers)
+    
+    # Admission control - concurrent analyses per worker, queued fairly across users
+    MAX_CONCURRENT_ANALYSES: int = 4
+    ADMISSION_MAX_QUEUED_PER_USER: int = 3
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 30.0
+    
+    # Report retention (0 disables each policy)
+    REPORT_RETENTION_DAYS: int = 0  # TTL on created_at - reports are deleted after this
+    REPORT_COMPACTION_DAYS: int = 0  # Older reports keep only summary counts
+    COMPACTION_INTERVAL_SECONDS: int = 3600
+    RETENTION_BATCH_SIZE: int = 500
     
     # JWT Authentication
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-super-secret-key-change-in-production")
@@ -33,3 +33,9 @@ def reports_collection():
     """Get the migration reports collection."""
     db = get_database()
     return db["migration_reports"]
+
+
+def profiles_collection():
+    """Get the request profiles collection."""
+    db = get_database()
+    return db["request_profiles"]
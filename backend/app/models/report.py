@@ -20,15 +20,19 @@ class AnalysisResult(BaseModel):
     files_analyzed: List[str]
     issues: List[dict]  # Each has: issue, severity, line_hint, fix
     summary: str
+    is_partial: bool = False  # True if the deadline cut the analysis short
+    tokens_used: int = 0  # Input + output tokens reported by the LLM
 
 
 class MigrationReport(BaseModel):
     """Stored migration report."""
     id: Optional[str] = Field(None, alias="_id")
+    owner_id: Optional[str] = None
     is_valid_python3: bool
     files_analyzed: List[str]
     issues: List[dict]
     summary: str
+    is_partial: bool = False
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
     class Config:
@@ -39,3 +43,4 @@ class AnalysisResponse(BaseModel):
     """API response after analysis."""
     report_id: str
     message: str
+    is_partial: bool = False
@@ -30,6 +30,8 @@ class UserInDB(UserBase):
     id: Optional[str] = Field(None, alias="_id")
     hashed_password: str
     is_active: bool = True
+    is_admin: bool = False
+    tier: Optional[str] = None  # Rate-limit tier; None uses settings.RATE_LIMIT_DEFAULT_TIER
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
     class Config:
@@ -1,15 +1,33 @@
 """
 API routes for migration analysis - Simplified.
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+import asyncio
+import contextlib
+
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Request, Query, Response, BackgroundTasks
 from bson import ObjectId
 
 from ..models.report import AnalysisResponse, MigrationReport
 from ..models.user import UserInDB
 from ..services.file_processor import FileProcessor
 from ..services.llm_analyzer import LLMAnalyzer
-from ..services.auth import get_current_user
-from ..database.mongodb import reports_collection
+from ..services.auth import get_current_user, get_current_admin_user
+from ..services.deadline import Deadline, DeadlineExceeded, wait_for_disconnect
+from ..services.metrics import metrics
+from ..services.retention import delete_reports
+from ..services.profiler import RequestProfiler, current_profiler, profile_stage
+from ..services.rate_limiter import (
+    RateLimitExceeded,
+    admission,
+    get_rate_limited_user,
+    rate_limiter,
+    too_many_requests,
+)
+from ..database.mongodb import reports_collection, profiles_collection
+from ..config import settings
 
 router = APIRouter(prefix="/api/migration", tags=["migration"])
 
@@ -17,15 +35,30 @@ router = APIRouter(prefix="/api/migration", tags=["migration"])
 file_processor = FileProcessor()
 llm_analyzer = LLMAnalyzer()
 
+# Header values accepted as "on", matching FastAPI's bool query parsing
+_TRUTHY = {"1", "true", "on", "yes"}
+
 
 @router.post("/analyze", response_model=AnalysisResponse)
 async def analyze_code(
+    request: Request,
     file: UploadFile = File(...),
-    current_user: UserInDB = Depends(get_current_user)
+    profile: bool = Query(False),
+    current_user: UserInDB = Depends(get_rate_limited_user)
 ):
     """
     Analyze Python files for Python 3 compatibility using LangChain + Gemini.
     Upload a .py file or .zip archive.
+
+    The request runs under a deadline (settings default, or the
+    X-Request-Timeout header in seconds). Work stops as soon as the
+    client disconnects.
+
+    Requests are rate limited per user (429 with Retry-After) and, when the
+    worker is saturated, queued fairly across users.
+
+    Admins can profile the request with ?profile=true or the X-Profile
+    header; the trace is stored with the report (see /report/{id}/profile).
     """
     # Validate
     is_valid, error = file_processor.validate_file(file)
@@ -33,35 +66,115 @@ async def analyze_code(
         raise HTTPException(status_code=400, detail=error)
     
     try:
-        # Process files
-        files = await file_processor.process_upload(file)
-        if not files:
-            raise HTTPException(status_code=400, detail="No Python files found")
-        
-        # Analyze with LangChain + Gemini
-        result = await llm_analyzer.analyze(files)
-        
-        # Create and store report
-        report = MigrationReport(
-            is_valid_python3=result.is_valid_python3,
-            files_analyzed=result.files_analyzed,
-            issues=result.issues,
-            summary=result.summary
-        )
-        
-        report_dict = report.model_dump(by_alias=True, exclude={"id"})
-        db_result = await reports_collection().insert_one(report_dict)
-        report_id = str(db_result.inserted_id)
-        
-        status = "✅ Valid Python 3" if result.is_valid_python3 else f"⚠️ Found {len(result.issues)} issues"
-        return AnalysisResponse(report_id=report_id, message=status)
-        
+        deadline = Deadline.from_request(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    profiler = None
+    profile_header = request.headers.get(settings.PROFILE_HEADER, "").strip().lower()
+    if profile or profile_header in _TRUTHY:
+        if not current_user.is_admin:
+            raise HTTPException(status_code=403, detail="Profiling requires admin privileges")
+        try:
+            profiler = RequestProfiler.start()
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+    
+    # Tasks copy the context, so the pipeline sees this request's profiler
+    token = current_profiler.set(profiler)
+    try:
+        analysis = asyncio.create_task(_run_analysis(file, deadline, current_user))
+        disconnect = asyncio.create_task(wait_for_disconnect(request))
+    finally:
+        current_profiler.reset(token)
+    try:
+        await asyncio.wait({analysis, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        disconnect.cancel()
+        if not analysis.done():
+            analysis.cancel()
+        if profiler:
+            profiler.stop()
+    
+    if analysis.cancelled() or not analysis.done():
+        # Let the cancelled pipeline unwind before answering
+        with contextlib.suppress(asyncio.CancelledError):
+            await analysis
+        metrics.increment("analysis_cancelled_total")
+        raise HTTPException(status_code=499, detail="Client closed request")
+    
+    response = analysis.result()
+    if profiler:
+        await profiles_collection().insert_one(profiler.to_document(response.report_id, current_user.id))
+    return response
+
+
+async def _run_analysis(file: UploadFile, deadline: Deadline, user: UserInDB) -> AnalysisResponse:
+    """Wait for an admission slot, run the pipeline, and map failures to HTTP errors."""
+    try:
+        remaining = deadline.remaining()
+        # If the client's deadline ends first, a queue timeout is a 504, not a 429
+        deadline_bound = remaining < settings.ADMISSION_QUEUE_TIMEOUT_SECONDS
+        queue_timeout = min(settings.ADMISSION_QUEUE_TIMEOUT_SECONDS, remaining)
+        async with admission.slot(user.id, queue_timeout, deadline_bound):
+            # Time spent queueing must not come out of the extraction budget
+            deadline.start_stages()
+            return await _analyze_admitted(file, deadline, user)
+    except HTTPException:
+        raise
+    except RateLimitExceeded as e:
+        raise too_many_requests(e)
+    except (asyncio.TimeoutError, DeadlineExceeded):
+        metrics.increment("analysis_deadline_exceeded_total")
+        raise HTTPException(status_code=504, detail="Analysis deadline exceeded")
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {e}")
 
 
+async def _analyze_admitted(file: UploadFile, deadline: Deadline, user: UserInDB) -> AnalysisResponse:
+    """Extraction, LLM analysis and persistence, each within its share of the deadline."""
+    # Process files
+    with profile_stage("extraction"):
+        files = await asyncio.wait_for(
+            file_processor.process_upload(file), deadline.budget("extraction")
+        )
+    if not files:
+        raise HTTPException(status_code=400, detail="No Python files found")
+    
+    charged = await rate_limiter.consume_llm_tokens(user, llm_analyzer.estimate_tokens(files))
+    
+    # Analyze with LangChain + Gemini
+    with profile_stage("llm"):
+        result = await llm_analyzer.analyze(files, timeout=deadline.budget("llm"))
+    await rate_limiter.reconcile_llm_tokens(user, charged, result.tokens_used)
+    
+    # Create and store report
+    report = MigrationReport(
+        owner_id=user.id,
+        is_valid_python3=result.is_valid_python3,
+        files_analyzed=result.files_analyzed,
+        issues=result.issues,
+        summary=result.summary,
+        is_partial=result.is_partial
+    )
+    
+    report_dict = report.model_dump(by_alias=True, exclude={"id"})
+    with profile_stage("persistence"):
+        db_result = await asyncio.wait_for(
+            reports_collection().insert_one(report_dict), deadline.budget("persistence")
+        )
+    report_id = str(db_result.inserted_id)
+    
+    if result.is_partial:
+        metrics.increment("analysis_partial_total")
+        status = f"⏱️ Partial analysis ({len(result.files_analyzed)} files): found {len(result.issues)} issues"
+    else:
+        status = "✅ Valid Python 3" if result.is_valid_python3 else f"⚠️ Found {len(result.issues)} issues"
+    return AnalysisResponse(report_id=report_id, message=status, is_partial=result.is_partial)
+
+
 @router.get("/report/{report_id}")
 async def get_report(report_id: str, current_user: UserInDB = Depends(get_current_user)):
     """Get a report by ID."""
@@ -75,9 +188,39 @@ async def get_report(report_id: str, current_user: UserInDB = Depends(get_curren
         raise HTTPException(status_code=404, detail="Report not found")
     
     report["id"] = str(report.pop("_id"))
+    if report.get("compacted"):
+        # Only summary counts are kept; issues_count/severity_counts carry them
+        report["issues"] = []
     return report
 
 
+@router.get("/report/{report_id}/profile")
+async def get_report_profile(
+    report_id: str,
+    format: str = Query("json", pattern="^(json|pstats)$"),
+    current_user: UserInDB = Depends(get_current_admin_user)
+):
+    """
+    Get the profile captured for a report's analysis request (admin only).
+    format=json returns stage/task timings and a text summary; format=pstats
+    downloads the raw cProfile data for pstats or snakeviz.
+    """
+    doc = await profiles_collection().find_one({"report_id": report_id})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    if format == "pstats":
+        return Response(
+            content=bytes(doc["pstats"]),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{report_id}.prof"'},
+        )
+    
+    doc.pop("_id")
+    doc.pop("pstats")
+    return doc
+
+
 @router.get("/reports")
 async def list_reports(limit: int = 10, current_user: UserInDB = Depends(get_current_user)):
     """List recent reports."""
@@ -88,7 +231,7 @@ async def list_reports(limit: int = 10, current_user: UserInDB = Depends(get_cur
             "id": str(r["_id"]),
             "files_analyzed": r.get("files_analyzed", []),
             "is_valid_python3": r.get("is_valid_python3"),
-            "issues_count": len(r.get("issues", [])),
+            "issues_count": r["issues_count"] if r.get("compacted") else len(r.get("issues", [])),
             "created_at": r.get("created_at")
         })
     return {"reports": reports}
@@ -105,4 +248,38 @@ async def delete_report(report_id: str, current_user: UserInDB = Depends(get_cur
     result = await reports_collection().delete_one({"_id": obj_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Report not found")
+    await profiles_collection().delete_many({"report_id": report_id})
     return {"message": "Deleted"}
+
+
+@router.delete("/reports", status_code=202)
+async def bulk_delete_reports(
+    background_tasks: BackgroundTasks,
+    owner_id: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    current_user: UserInDB = Depends(get_current_user)
+):
+    """
+    Delete reports by owner and/or creation date range, in batches in the background.
+    Non-admin users can only delete their own reports.
+    """
+    if not current_user.is_admin:
+        if owner_id not in (None, current_user.id):
+            raise HTTPException(status_code=403, detail="Cannot delete other users' reports")
+        owner_id = current_user.id
+    if owner_id is None and created_after is None and created_before is None:
+        raise HTTPException(status_code=400, detail="Specify owner_id or a date range")
+    
+    query = {}
+    if owner_id is not None:
+        query["owner_id"] = owner_id
+    if created_after is not None or created_before is not None:
+        query["created_at"] = {}
+        if created_after is not None:
+            query["created_at"]["$gte"] = created_after
+        if created_before is not None:
+            query["created_at"]["$lt"] = created_before
+    
+    background_tasks.add_task(delete_reports, query)
+    return {"message": "Bulk delete scheduled"}
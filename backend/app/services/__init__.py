@@ -1,2 +1,10 @@
-from .llm_analyzer import LLMAnalyzer
-from .file_processor import FileProcessor
+# Re-exports are resolved lazily: CPU-pool workers import
+# app.services.extraction and must not pull in LangChain/FastAPI with it.
+def __getattr__(name):
+    if name == "LLMAnalyzer":
+        from .llm_analyzer import LLMAnalyzer
+        return LLMAnalyzer
+    if name == "FileProcessor":
+        from .file_processor import FileProcessor
+        return FileProcessor
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
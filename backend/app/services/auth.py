@@ -130,6 +130,20 @@ async def get_current_user(
     return user
 
 
+async def get_current_admin_user(
+    current_user: UserInDB = Depends(get_current_user)
+) -> UserInDB:
+    """
+    Dependency that only lets admin users through.
+    """
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required"
+        )
+    return current_user
+
+
 async def get_current_user_optional(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))
 ) -> Optional[UserInDB]:
@@ -0,0 +1,55 @@
+"""
+Process pool for CPU-bound work (archive decompression, source decoding).
+
+Keeps that work off the event loop so one large upload does not stall every
+other request in the worker. Set CPU_POOL_WORKERS=0 to run jobs inline.
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from ..config import settings
+
+# Global executor, created on first use
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_cpu_pool() -> Optional[ProcessPoolExecutor]:
+    """Get the process pool, or None when running inline."""
+    global _executor
+    if settings.CPU_POOL_WORKERS <= 0:
+        return None
+    if _executor is None:
+        # spawn: forking a process that already runs Motor's threads is unsafe
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.CPU_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown_cpu_pool() -> None:
+    """Stop the pool's worker processes."""
+    global _executor
+    if _executor:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+async def run_cpu_bound(func: Callable[..., Any], *args: Any) -> Any:
+    """Run func(*args) in the process pool (or inline when it is disabled)."""
+    pool = get_cpu_pool()
+    if pool is None:
+        return func(*args)
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(pool, func, *args)
+    except BrokenProcessPool:
+        # A worker died; drop the pool so the next job gets a fresh one
+        global _executor
+        if _executor is pool:
+            _executor = None
+            pool.shutdown(wait=False, cancel_futures=True)
+        raise
@@ -0,0 +1,81 @@
+"""
+Per-request deadlines, split into budgets for each analysis stage.
+"""
+import asyncio
+import time
+
+from fastapi import Request
+
+from ..config import settings
+
+
+# Pipeline stages in execution order
+STAGES = ("extraction", "llm", "persistence")
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a pipeline stage runs out of time."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+
+
+def _stage_ratio(stage: str) -> float:
+    return {
+        "extraction": settings.EXTRACTION_BUDGET_RATIO,
+        "llm": settings.LLM_BUDGET_RATIO,
+        "persistence": settings.PERSISTENCE_BUDGET_RATIO,
+    }[stage]
+
+
+class Deadline:
+    """Absolute deadline for one request."""
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+
+    @classmethod
+    def from_request(cls, request: Request) -> "Deadline":
+        """Build a deadline from the request header, falling back to the default."""
+        raw = request.headers.get(settings.DEADLINE_HEADER)
+        if raw is None:
+            return cls(settings.ANALYSIS_DEADLINE_SECONDS)
+        try:
+            timeout = float(raw)
+        except ValueError:
+            raise ValueError(f"Invalid {settings.DEADLINE_HEADER} header")
+        if timeout <= 0:
+            raise ValueError(f"{settings.DEADLINE_HEADER} must be positive")
+        return cls(min(timeout, settings.ANALYSIS_MAX_DEADLINE_SECONDS))
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def start_stages(self) -> None:
+        """
+        Split whatever time is left (e.g. after queueing for admission) between
+        the pipeline stages, instead of the original timeout.
+        """
+        self.timeout = self.remaining()
+
+    def budget(self, stage: str) -> float:
+        """
+        Time available to a stage: whatever is left, minus the share
+        reserved for the stages that still have to run after it.
+        """
+        later = STAGES[STAGES.index(stage) + 1:]
+        reserved = sum(_stage_ratio(s) for s in later) * self.timeout
+        return max(0.0, self.remaining() - reserved)
+
+
+async def wait_for_disconnect(request: Request, interval: float = 0.5) -> None:
+    """Return once the client has gone away."""
+    while not await request.is_disconnected():
+        await asyncio.sleep(interval)
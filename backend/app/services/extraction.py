@@ -0,0 +1,145 @@
+"""
+CPU-bound extraction helpers.
+
+Zip and single-file extraction run inside the CPU process pool and are plain,
+picklable module-level functions. Source text crosses the process boundary
+through temp files: the worker writes decoded sources (re-encoded as UTF-8)
+back to back into an output file and only returns a small index of
+(filename, offset, length) tuples.
+
+Tar archives and git bundles are read sequentially, member by member,
+straight from the upload stream (see read_streamed_sources).
+"""
+import io
+import lzma
+import tarfile
+import tokenize
+import zipfile
+import zlib
+from typing import BinaryIO, Callable, Iterator, List, Tuple
+
+from .git_bundle import iter_bundle_files
+
+# (filename, byte offset, byte length) into the output file
+IndexEntry = Tuple[str, int, int]
+
+
+def decode_source(data: bytes) -> str:
+    """
+    Decode Python source bytes the way the interpreter would (PEP 263):
+    honour a BOM or ``# -*- coding: ... -*-`` cookie, default to UTF-8.
+    Files that still fail to decode are read as latin-1, which is lossless.
+    """
+    try:
+        encoding, _ = tokenize.detect_encoding(io.BytesIO(data).readline)
+        return data.decode(encoding)
+    except (SyntaxError, LookupError, UnicodeDecodeError):
+        return data.decode("latin-1")
+
+
+def is_python_member(name: str) -> bool:
+    """True for .py archive members outside __pycache__."""
+    return name.endswith(".py") and "__pycache__" not in name
+
+
+def _write_source(out: BinaryIO, index: List[IndexEntry], name: str, data: bytes) -> None:
+    encoded = decode_source(data).encode("utf-8")
+    index.append((name, out.tell(), len(encoded)))
+    out.write(encoded)
+
+
+def extract_py(src_path: str, out_path: str, filename: str) -> List[IndexEntry]:
+    """Decode a single uploaded .py file."""
+    index: List[IndexEntry] = []
+    with open(src_path, "rb") as src, open(out_path, "wb") as out:
+        _write_source(out, index, filename, src.read())
+    return index
+
+
+def extract_zip(src_path: str, out_path: str, max_extracted: int) -> List[IndexEntry]:
+    """Decompress and decode the .py members of a zip archive."""
+    index: List[IndexEntry] = []
+    total = 0
+    with zipfile.ZipFile(src_path, "r") as zf, open(out_path, "wb") as out:
+        for info in zf.infolist():
+            if info.is_dir() or not is_python_member(info.filename):
+                continue
+            total += info.file_size
+            if total > max_extracted:
+                raise ValueError("Archive contents exceed the maximum extracted size")
+            try:
+                data = zf.read(info)
+            except (zipfile.BadZipFile, RuntimeError, NotImplementedError):
+                # Corrupt, encrypted or unsupported members are skipped
+                continue
+            _write_source(out, index, info.filename, data)
+    return index
+
+
+def read_sources(out_path: str, index: List[IndexEntry]) -> List[dict]:
+    """Load the worker's output file back into {filename, content} dicts."""
+    files = []
+    with open(out_path, "rb") as out:
+        for name, offset, length in index:
+            out.seek(offset)
+            files.append({"filename": name, "content": out.read(length).decode("utf-8")})
+    return files
+
+
+class LimitedReader:
+    """File wrapper that raises ValueError once more than limit bytes are read."""
+
+    def __init__(self, stream: BinaryIO, limit: int):
+        self.stream = stream
+        self.limit = limit
+        self.read_bytes = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        self.read_bytes += len(data)
+        if self.read_bytes > self.limit:
+            raise ValueError(f"File exceeds the {self.limit // (1024 * 1024)}MB upload limit")
+        return data
+
+
+def iter_tar_sources(stream: BinaryIO, max_extracted: int) -> Iterator[Tuple[str, bytes]]:
+    """Yield (name, data) for .py members of a tar, tar.gz or tar.xz stream."""
+    total = 0
+    try:
+        # "r|*" reads sequentially and detects the compression itself
+        with tarfile.open(fileobj=stream, mode="r|*") as tf:
+            for member in tf:
+                # Streaming past a member still decompresses it, so every
+                # member counts against the limit, not just the .py ones
+                total += member.size
+                if total > max_extracted:
+                    raise ValueError("Archive contents exceed the maximum extracted size")
+                if not member.isfile() or not is_python_member(member.name):
+                    continue
+                yield member.name, tf.extractfile(member).read()
+    except (tarfile.TarError, EOFError, zlib.error, lzma.LZMAError, OSError) as e:
+        raise ValueError(f"Invalid tar archive: {e}")
+
+
+def iter_bundle_sources(stream: BinaryIO, max_extracted: int) -> Iterator[Tuple[str, bytes]]:
+    """Yield (path, data) for .py files at the head of a git bundle."""
+    try:
+        for path, data in iter_bundle_files(stream, max_extracted):
+            if is_python_member(path):
+                yield path, data
+    except (zlib.error, IndexError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid git bundle: {e}")
+
+
+def read_streamed_sources(
+    stream: BinaryIO,
+    reader: Callable[[BinaryIO, int], Iterator[Tuple[str, bytes]]],
+    max_size: int,
+    max_extracted: int,
+) -> List[dict]:
+    """Decode the sources produced by a streaming archive reader."""
+    limited = LimitedReader(stream, max_size)
+    return [
+        {"filename": name, "content": decode_source(data)}
+        for name, data in reader(limited, max_extracted)
+    ]
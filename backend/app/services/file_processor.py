@@ -1,55 +1,102 @@
 """
-File processing service - handles .py and .zip uploads.
+File processing service - handles .py, .zip, tar and git bundle uploads.
+
+Zip and .py decompression/decoding run in the CPU process pool; the upload
+and the decoded sources travel to and from the pool as temp files. Tar
+archives and git bundles are read member by member straight from the upload
+stream in a worker thread (zlib/lzma release the GIL), without copying the
+archive to disk first.
 """
-import zipfile
-import tempfile
+import asyncio
 import os
+import tempfile
 from typing import List, Dict, Tuple
 from fastapi import UploadFile
 
+from ..config import settings
+from .cpu_pool import run_cpu_bound
+from .extraction import (
+    extract_py,
+    extract_zip,
+    iter_bundle_sources,
+    iter_tar_sources,
+    read_sources,
+    read_streamed_sources,
+)
+
+# Copy uploads to disk in chunks of this size
+_CHUNK_SIZE = 1024 * 1024
+
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.xz", ".txz")
+BUNDLE_SUFFIXES = (".bundle",)
+
 
 class FileProcessor:
     """Handles file uploads and extracts Python code."""
-    
+
     async def process_upload(self, file: UploadFile) -> List[Dict[str, str]]:
         """Process uploaded file and return list of {filename, content}."""
-        if file.filename.lower().endswith(".zip"):
+        name = file.filename.lower()
+        if name.endswith(".zip"):
             return await self._process_zip(file)
+        if name.endswith(TAR_SUFFIXES):
+            return await self._process_stream(file, iter_tar_sources)
+        if name.endswith(BUNDLE_SUFFIXES):
+            return await self._process_stream(file, iter_bundle_sources)
         return await self._process_py(file)
-    
+
     async def _process_py(self, file: UploadFile) -> List[Dict[str, str]]:
         """Process single .py file."""
-        content = await file.read()
-        text = content.decode("utf-8", errors="replace")
-        return [{"filename": file.filename, "content": text}]
-    
+        return await self._extract(file, ".py", extract_py, file.filename)
+
     async def _process_zip(self, file: UploadFile) -> List[Dict[str, str]]:
         """Extract .py files from zip."""
-        files = []
-        content = await file.read()
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".zip") as tmp:
-            tmp.write(content)
-            tmp_path = tmp.name
-        
+        return await self._extract(file, ".zip", extract_zip, settings.MAX_EXTRACTED_SIZE)
+
+    async def _process_stream(self, file: UploadFile, reader) -> List[Dict[str, str]]:
+        """Read a tar archive or git bundle sequentially from the upload."""
+        file.file.seek(0)
+        return await asyncio.to_thread(
+            read_streamed_sources, file.file, reader,
+            settings.MAX_FILE_SIZE, settings.MAX_EXTRACTED_SIZE
+        )
+
+    async def _extract(self, file: UploadFile, suffix: str, func, *args) -> List[Dict[str, str]]:
+        """Spill the upload to a temp file, run func in the pool, read the results back."""
+        src_path = await asyncio.to_thread(self._spill_upload, file, suffix)
+        fd, out_path = tempfile.mkstemp(suffix=".src")
+        os.close(fd)
         try:
-            with zipfile.ZipFile(tmp_path, "r") as zf:
-                for name in zf.namelist():
-                    if not name.endswith(".py") or "__pycache__" in name:
-                        continue
-                    try:
-                        data = zf.read(name).decode("utf-8", errors="replace")
-                        files.append({"filename": name, "content": data})
-                    except:
-                        continue
+            # Pass paths, not file contents, so nothing large gets pickled
+            index = await run_cpu_bound(func, src_path, out_path, *args)
+            return await asyncio.to_thread(read_sources, out_path, index)
         finally:
-            os.unlink(tmp_path)
-        
-        return files
-    
+            os.unlink(src_path)
+            os.unlink(out_path)
+
+    def _spill_upload(self, file: UploadFile, suffix: str) -> str:
+        """Copy the upload to a named temp file, enforcing MAX_FILE_SIZE."""
+        file.file.seek(0)
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+            try:
+                size = 0
+                while chunk := file.file.read(_CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > settings.MAX_FILE_SIZE:
+                        raise ValueError(
+                            f"File exceeds the {settings.MAX_FILE_SIZE // (1024 * 1024)}MB upload limit"
+                        )
+                    tmp.write(chunk)
+            except Exception:
+                tmp.close()
+                os.unlink(tmp.name)
+                raise
+        return tmp.name
+
     def validate_file(self, file: UploadFile) -> Tuple[bool, str]:
-        """Check if file is .py or .zip."""
-        name = file.filename.lower()
-        if name.endswith(".py") or name.endswith(".zip"):
+        """Check the file has one of settings.ALLOWED_EXTENSIONS."""
+        name = (file.filename or "").lower()
+        if name.endswith(tuple(settings.ALLOWED_EXTENSIONS)):
             return True, ""
-        return False, "Only .py and .zip files allowed"
+        allowed = ", ".join(sorted(settings.ALLOWED_EXTENSIONS))
+        return False, f"Only {allowed} files allowed"
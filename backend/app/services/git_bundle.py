@@ -0,0 +1,318 @@
+"""
+Offline reader for git bundles (v2/v3, SHA-1).
+
+Parses the bundle header and the packfile that follows it straight from a
+binary stream, resolves deltas in memory and walks the tree of the bundle's
+HEAD (or main/master) to yield the files it contains. No git binary and no
+network access are involved.
+"""
+import hashlib
+import zlib
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+_CHUNK_SIZE = 64 * 1024
+
+# Packfile object types
+_COMMIT, _TREE, _BLOB, _TAG, _OFS_DELTA, _REF_DELTA = 1, 2, 3, 4, 6, 7
+_TYPE_NAMES = {_COMMIT: b"commit", _TREE: b"tree", _BLOB: b"blob", _TAG: b"tag"}
+
+
+class _StreamReader:
+    """Buffered reader over a non-seekable stream that tracks its position."""
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self.buf = b""
+        self.pos = 0
+
+    def _fill(self, n: int) -> None:
+        while len(self.buf) < n:
+            chunk = self.stream.read(_CHUNK_SIZE)
+            if not chunk:
+                return
+            self.buf += chunk
+
+    def read_exact(self, n: int) -> bytes:
+        self._fill(n)
+        if len(self.buf) < n:
+            raise ValueError("Truncated git bundle")
+        data, self.buf = self.buf[:n], self.buf[n:]
+        self.pos += n
+        return data
+
+    def read_byte(self) -> int:
+        return self.read_exact(1)[0]
+
+    def readline(self) -> bytes:
+        while b"\n" not in self.buf:
+            size = len(self.buf)
+            self._fill(size + 1)
+            if len(self.buf) == size:
+                raise ValueError("Truncated git bundle")
+        return self.read_exact(self.buf.index(b"\n") + 1)
+
+    def inflate(self, size: int) -> bytes:
+        """Inflate one zlib stream that must decompress to exactly size bytes."""
+        d = zlib.decompressobj()
+        out: List[bytes] = []
+        produced = 0
+        while not d.eof:
+            if not self.buf:
+                self._fill(1)
+                if not self.buf:
+                    raise ValueError("Truncated git bundle")
+            data = self.buf
+            # Never produce more than the header promised (bounds zlib bombs)
+            chunk = d.decompress(data, size + 1 - produced)
+            produced += len(chunk)
+            if produced > size:
+                raise ValueError("Corrupt git bundle object")
+            out.append(chunk)
+            self.buf = d.unused_data if d.eof else d.unconsumed_tail
+            self.pos += len(data) - len(self.buf)
+        if produced != size:
+            raise ValueError("Corrupt git bundle object")
+        return b"".join(out)
+
+
+def _delta_varint(delta: bytes, i: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        if i >= len(delta):
+            raise ValueError("Corrupt git bundle delta")
+        c = delta[i]
+        i += 1
+        value |= (c & 0x7F) << shift
+        shift += 7
+        if not c & 0x80:
+            return value, i
+
+
+def _delta_target_size(delta: bytes) -> int:
+    """Size of the object a delta rebuilds, as declared in its header."""
+    _, i = _delta_varint(delta, 0)
+    return _delta_varint(delta, i)[0]
+
+
+def _apply_delta(base: bytes, delta: bytes) -> bytes:
+    """Rebuild an object from its base and a git delta."""
+    src_size, i = _delta_varint(delta, 0)
+    dst_size, i = _delta_varint(delta, i)
+    if src_size != len(base):
+        raise ValueError("Corrupt git bundle delta")
+
+    out = bytearray()
+    while i < len(delta):
+        op = delta[i]
+        i += 1
+        if op & 0x80:
+            # Copy a range of the base object
+            offset = size = 0
+            for bit in range(4):
+                if op & (1 << bit):
+                    offset |= delta[i] << (8 * bit)
+                    i += 1
+            for bit in range(3):
+                if op & (1 << (4 + bit)):
+                    size |= delta[i] << (8 * bit)
+                    i += 1
+            size = size or 0x10000
+            if offset + size > len(base):
+                raise ValueError("Corrupt git bundle delta")
+            out += base[offset:offset + size]
+        elif op:
+            # Insert literal bytes
+            if i + op > len(delta):
+                raise ValueError("Corrupt git bundle delta")
+            out += delta[i:i + op]
+            i += op
+        else:
+            raise ValueError("Corrupt git bundle delta")
+        # Never grow past the declared size, which was checked against the budget
+        if len(out) > dst_size:
+            raise ValueError("Corrupt git bundle delta")
+
+    if len(out) != dst_size:
+        raise ValueError("Corrupt git bundle delta")
+    return bytes(out)
+
+
+def _read_header(reader: _StreamReader) -> Tuple[Dict[str, str], bool]:
+    """Parse the bundle header, returning ({refname: oid}, has_prerequisites)."""
+    signature = reader.readline()
+    if signature not in (b"# v2 git bundle\n", b"# v3 git bundle\n"):
+        raise ValueError("Not a git bundle")
+
+    refs: Dict[str, str] = {}
+    has_prerequisites = False
+    while True:
+        line = reader.readline().rstrip(b"\n")
+        if not line:
+            return refs, has_prerequisites
+        if line.startswith(b"@"):
+            # v3 capabilities - only SHA-1 repositories are supported
+            if line.startswith(b"@object-format=") and line != b"@object-format=sha1":
+                raise ValueError("Unsupported git bundle object format")
+            continue
+        if line.startswith(b"-"):
+            # Prerequisite commit of an incremental bundle
+            has_prerequisites = True
+            continue
+        oid, _, ref = line.partition(b" ")
+        refs[ref.decode("utf-8", "replace")] = oid.decode("ascii")
+
+
+def _read_pack(reader: _StreamReader, max_inflated: int) -> Dict[str, Tuple[int, bytes]]:
+    """Read every object in the packfile, returning {oid: (type, data)}."""
+    pack_start = reader.pos
+    header = reader.read_exact(12)
+    if header[:4] != b"PACK" or int.from_bytes(header[4:8], "big") not in (2, 3):
+        raise ValueError("Invalid git bundle packfile")
+    count = int.from_bytes(header[8:12], "big")
+
+    objects: Dict[str, Tuple[int, bytes]] = {}
+    by_offset: Dict[int, str] = {}
+    # Deltas whose base is not available yet: (offset, base oid, base offset,
+    # delta). OFS_DELTAs on a still-pending base only know the base's offset.
+    pending: List[Tuple[int, Optional[str], Optional[int], bytes]] = []
+    pending_offsets = set()
+    inflated = 0
+
+    def store(offset: int, obj_type: int, data: bytes) -> None:
+        oid = hashlib.sha1(b"%s %d\0" % (_TYPE_NAMES[obj_type], len(data)) + data).hexdigest()
+        objects[oid] = (obj_type, data)
+        by_offset[offset] = oid
+
+    def base_of(base_oid: Optional[str], base_offset: Optional[int]) -> Optional[str]:
+        if base_oid is None:
+            base_oid = by_offset.get(base_offset)
+        return base_oid if base_oid in objects else None
+
+    def rebuild(offset: int, base_oid: str, delta: bytes) -> None:
+        # Rebuilt objects count against the cap too, or a small delta of
+        # repeated copy ops could expand to any size
+        nonlocal inflated
+        inflated += _delta_target_size(delta)
+        if inflated > max_inflated:
+            raise ValueError("Archive contents exceed the maximum extracted size")
+        base_type, base = objects[base_oid]
+        store(offset, base_type, _apply_delta(base, delta))
+
+    for _ in range(count):
+        offset = reader.pos - pack_start
+        c = reader.read_byte()
+        obj_type, size, shift = (c >> 4) & 7, c & 0x0F, 4
+        while c & 0x80:
+            c = reader.read_byte()
+            size |= (c & 0x7F) << shift
+            shift += 7
+
+        base_oid: Optional[str] = None
+        base_offset: Optional[int] = None
+        if obj_type == _OFS_DELTA:
+            c = reader.read_byte()
+            distance = c & 0x7F
+            while c & 0x80:
+                c = reader.read_byte()
+                distance = ((distance + 1) << 7) | (c & 0x7F)
+            base_offset = offset - distance
+            if base_offset not in by_offset and base_offset not in pending_offsets:
+                raise ValueError("Corrupt git bundle packfile")
+        elif obj_type == _REF_DELTA:
+            base_oid = reader.read_exact(20).hex()
+        elif obj_type not in _TYPE_NAMES:
+            raise ValueError("Corrupt git bundle packfile")
+
+        inflated += size
+        if inflated > max_inflated:
+            raise ValueError("Archive contents exceed the maximum extracted size")
+        data = reader.inflate(size)
+
+        if base_oid is None and base_offset is None:
+            store(offset, obj_type, data)
+        elif base_of(base_oid, base_offset):
+            rebuild(offset, base_of(base_oid, base_offset), data)
+        else:
+            pending.append((offset, base_oid, base_offset, data))
+            pending_offsets.add(offset)
+
+    # Resolve deltas whose base came later in the pack or was itself pending.
+    # Bases that never appear belong to an incremental bundle's prerequisite
+    # commits; those objects stay missing and are reported when needed.
+    while pending:
+        unresolved = []
+        for offset, base_oid, base_offset, data in pending:
+            resolved = base_of(base_oid, base_offset)
+            if resolved:
+                rebuild(offset, resolved, data)
+            else:
+                unresolved.append((offset, base_oid, base_offset, data))
+        if len(unresolved) == len(pending):
+            break
+        pending = unresolved
+
+    return objects
+
+
+def _head_oid(refs: Dict[str, str]) -> str:
+    for ref in ("HEAD", "refs/heads/main", "refs/heads/master"):
+        if ref in refs:
+            return refs[ref]
+    if not refs:
+        raise ValueError("Git bundle has no refs")
+    return next(iter(refs.values()))
+
+
+def _walk_tree(lookup: Callable[[str, int], bytes], tree_oid: str) -> Iterator[Tuple[str, str]]:
+    """Yield (path, blob oid) for regular files under a tree."""
+    # Iterative, so arbitrarily deep trees cannot exhaust the Python stack
+    stack = [(tree_oid, "")]
+    while stack:
+        oid, prefix = stack.pop()
+        data = lookup(oid, _TREE)
+        i = 0
+        while i < len(data):
+            space = data.index(b" ", i)
+            nul = data.index(b"\0", space)
+            mode = data[i:space]
+            name = data[space + 1:nul].decode("utf-8", "replace")
+            entry_oid = data[nul + 1:nul + 21].hex()
+            i = nul + 21
+            if mode == b"40000":
+                stack.append((entry_oid, f"{prefix}{name}/"))
+            elif mode in (b"100644", b"100755"):
+                # Symlinks (120000) and submodules (160000) carry no source
+                yield f"{prefix}{name}", entry_oid
+
+
+def iter_bundle_files(stream: BinaryIO, max_inflated: int) -> Iterator[Tuple[str, bytes]]:
+    """
+    Yield (path, content) for every file in the tree of the bundle's head
+    commit. max_inflated bounds the total decompressed size of the pack.
+    """
+    reader = _StreamReader(stream)
+    refs, has_prerequisites = _read_header(reader)
+    objects = _read_pack(reader, max_inflated)
+
+    def lookup(oid: str, expected_type: int) -> bytes:
+        entry = objects.get(oid)
+        if entry is None:
+            if has_prerequisites:
+                # The object lives in (or is a delta against) a prerequisite commit
+                raise ValueError(
+                    "Incremental git bundles that depend on prerequisite commits are not supported"
+                )
+            raise ValueError("Corrupt git bundle: missing object")
+        if entry[0] != expected_type:
+            raise ValueError("Corrupt git bundle: unexpected object type")
+        return entry[1]
+
+    oid = _head_oid(refs)
+    # Peel annotated tags down to the commit
+    while objects.get(oid, (None,))[0] == _TAG:
+        oid = lookup(oid, _TAG).split(b"\n", 1)[0].split(b" ", 1)[1].decode("ascii")
+    commit = lookup(oid, _COMMIT)
+
+    tree_oid = commit.split(b"\n", 1)[0].split(b" ", 1)[1].decode("ascii")
+    for path, blob_oid in _walk_tree(lookup, tree_oid):
+        yield path, lookup(blob_oid, _BLOB)
@@ -1,8 +1,9 @@
 """
 LLM Analyzer using LangChain + Gemini to check Python 3 compatibility.
 """
+import asyncio
 import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
@@ -11,6 +12,9 @@ from pydantic import BaseModel, Field
 
 from ..config import settings
 from ..models.report import AnalysisResult, Severity
+from .deadline import DeadlineExceeded
+from .metrics import metrics
+from .profiler import track_task
 
 
 # Pydantic model for structured LLM output
@@ -64,7 +68,8 @@ class LLMAnalyzer:
                 google_api_key=settings.GEMINI_API_KEY,
                 temperature=0,
             )
-            self.chain = ANALYSIS_PROMPT | self.llm | _OUTPUT_PARSER
+            # Parsing happens separately so the AIMessage's usage_metadata is kept
+            self.chain = ANALYSIS_PROMPT | self.llm
             self.enabled = True
             print("LLM Analyzer initialized with Gemini API")
         except Exception as e:
@@ -79,8 +84,10 @@ class LLMAnalyzer:
             return None
         return filename, content
 
-    async def analyze(self, files: List[Dict[str, Any]]) -> AnalysisResult:
-        """Analyze uploaded Python files for Python 2 vs Python 3 compatibility."""
+    def _build_batches(self, files: List[Dict[str, Any]]) -> List[Tuple[List[str], str]]:
+        """Group files into (filenames, combined code) batches, one LLM call each."""
+        batches: List[Tuple[List[str], str]] = []
+        names: List[str] = []
         code_parts: List[str] = []
 
         for f in files[:10]:
@@ -91,19 +98,94 @@ class LLMAnalyzer:
 
             if len(content) > 5000:
                 content = content[:5000] + "\n# ... (file truncated)"
+            names.append(filename)
             code_parts.append(f"# === File: {filename} ===\n{content}")
 
-        combined_code = "\n\n".join(code_parts)
+            if len(code_parts) >= settings.LLM_FILES_PER_BATCH:
+                batches.append((names, "\n\n".join(code_parts)))
+                names, code_parts = [], []
+
+        if code_parts or not batches:
+            batches.append((names, "\n\n".join(code_parts)))
+        return batches
+
+    def estimate_tokens(self, files: List[Dict[str, Any]]) -> int:
+        """Rough prompt size in tokens (~4 chars each), used for quota accounting."""
+        return sum(len(code) for _, code in self._build_batches(files)) // 4
+
+    async def analyze(self, files: List[Dict[str, Any]], timeout: Optional[float] = None) -> AnalysisResult:
+        """
+        Analyze uploaded Python files for Python 2 vs Python 3 compatibility.
+
+        Batches are sent concurrently. If ``timeout`` expires, outstanding calls
+        are cancelled. Batches that failed or did not finish are left out and the
+        rest are returned as a partial result; if no batch succeeded, the first
+        batch error (or DeadlineExceeded) is raised.
+        """
+        batches = self._build_batches(files)
 
         if not self.enabled:
             raise ValueError("LLM analyzer is not configured. Please set GEMINI_API_KEY.")
 
-        print(f"Sending {len(combined_code)} chars to LLM for analysis...")
-        parsed: AnalysisOutput = await self.chain.ainvoke({"code": combined_code})
-        return self._parse_result(parsed, files)
-
-    def _parse_result(self, result: AnalysisOutput, files: List[Dict[str, Any]]) -> AnalysisResult:
-        """Convert LLM response to AnalysisResult."""
+        print(f"Sending {sum(len(code) for _, code in batches)} chars to LLM "
+              f"in {len(batches)} batch(es) for analysis...")
+        # Tokens reported by each finished LLM call, even if parsing then fails
+        usage: List[int] = []
+        tasks = {}
+        for i, (names, code) in enumerate(batches):
+            task = asyncio.create_task(self._run_batch(code, usage))
+            track_task(task, f"llm_batch_{i}")
+            tasks[task] = names
+        try:
+            done, pending = await asyncio.wait(tasks, timeout=timeout)
+        finally:
+            # Runs on timeout and when the caller is cancelled (client gone)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        outputs: List[AnalysisOutput] = []
+        analyzed: List[str] = []
+        failures: List[BaseException] = []
+        for task, names in tasks.items():
+            if task not in done:
+                continue
+            if task.exception() is not None:
+                # A failed batch is treated like an unfinished one
+                failures.append(task.exception())
+                metrics.increment("llm_batch_failures_total")
+                print(f"LLM batch for {names} failed: {task.exception()!r}")
+                continue
+            outputs.append(task.result())
+            analyzed.extend(names)
+
+        if not pending and not failures:
+            files_analyzed = []
+            for f in files:
+                fields = self._get_file_fields(f)
+                if fields:
+                    files_analyzed.append(fields[0])
+            return self._parse_result(outputs, files_analyzed, tokens_used=sum(usage))
+        if not outputs:
+            if failures:
+                raise failures[0]
+            raise DeadlineExceeded("llm")
+        return self._parse_result(outputs, analyzed, is_partial=True, tokens_used=sum(usage))
+
+    async def _run_batch(self, code: str, usage: List[int]) -> AnalysisOutput:
+        """One LLM call; records the tokens it used before parsing the reply."""
+        message = await self.chain.ainvoke({"code": code})
+        usage.append((getattr(message, "usage_metadata", None) or {}).get("total_tokens", 0))
+        return await _OUTPUT_PARSER.ainvoke(message)
+
+    def _parse_result(
+        self,
+        results: List[AnalysisOutput],
+        files_analyzed: List[str],
+        is_partial: bool = False,
+        tokens_used: int = 0,
+    ) -> AnalysisResult:
+        """Merge per-batch LLM responses into a single AnalysisResult."""
         severity_map = {
             "high": Severity.HIGH,
             "medium": Severity.MEDIUM,
@@ -111,25 +193,23 @@ class LLMAnalyzer:
         }
 
         issues = []
-        for item in result.issues:
-            sev_enum = severity_map.get(item.severity.lower(), Severity.MEDIUM)
-            issues.append({
-                "issue": item.issue,
-                # Ensure JSON-friendly output for the frontend
-                "severity": sev_enum.value if hasattr(sev_enum, "value") else str(sev_enum),
-                "line_hint": item.line_hint,
-                "fix": item.fix,
-            })
-
-        files_analyzed = []
-        for f in files:
-            fields = self._get_file_fields(f)
-            if fields:
-                files_analyzed.append(fields[0])
+        for result in results:
+            for item in result.issues:
+                sev_enum = severity_map.get(item.severity.lower(), Severity.MEDIUM)
+                issues.append({
+                    "issue": item.issue,
+                    # Ensure JSON-friendly output for the frontend
+                    "severity": sev_enum.value if hasattr(sev_enum, "value") else str(sev_enum),
+                    "line_hint": item.line_hint,
+                    "fix": item.fix,
+                })
 
         return AnalysisResult(
-            is_valid_python3=result.is_valid_python3,
+            # Files that were never checked cannot be vouched for
+            is_valid_python3=not is_partial and all(r.is_valid_python3 for r in results),
             files_analyzed=files_analyzed,
             issues=issues,
-            summary=result.summary,
+            summary=" ".join(r.summary for r in results),
+            is_partial=is_partial,
+            tokens_used=tokens_used,
         )
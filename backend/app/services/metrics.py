@@ -0,0 +1,23 @@
+"""
+In-process counters for operational metrics.
+"""
+from collections import defaultdict
+from typing import Dict
+
+
+class Metrics:
+    """Simple named counters, exposed through the /metrics endpoint."""
+
+    def __init__(self):
+        self._counters: Dict[str, int] = defaultdict(int)
+
+    def increment(self, name: str, value: int = 1) -> None:
+        """Increase a counter by value."""
+        self._counters[name] += value
+
+    def snapshot(self) -> Dict[str, int]:
+        """Return a copy of all counters."""
+        return dict(self._counters)
+
+
+metrics = Metrics()
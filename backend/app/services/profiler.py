@@ -0,0 +1,116 @@
+"""
+Opt-in profiling of a single analysis request.
+
+A RequestProfiler wraps cProfile plus wall-clock timings for pipeline stages
+and the asyncio tasks the request spawns. It is found through a context
+variable, so code paths that are not being profiled only pay for one
+ContextVar lookup.
+
+cProfile hooks the event-loop thread, so coroutines from other requests that
+run while the profile is active show up too; only one request can be
+profiled at a time. Work done in the CPU pool or in threads only appears in
+the stage timings.
+"""
+import asyncio
+import contextlib
+import cProfile
+import io
+import marshal
+import pstats
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from bson import Binary
+
+current_profiler: ContextVar[Optional["RequestProfiler"]] = ContextVar("current_profiler", default=None)
+
+# The profiler currently hooked into the event-loop thread, if any
+_active: Optional["RequestProfiler"] = None
+
+
+class RequestProfiler:
+    """cProfile trace plus stage and task timings for one request."""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.started = time.perf_counter()
+        self.stages: List[Dict] = []
+        self.tasks: List[Dict] = []
+
+    @classmethod
+    def start(cls) -> "RequestProfiler":
+        """Begin profiling; raises RuntimeError if another request is being profiled."""
+        global _active
+        if _active is not None:
+            raise RuntimeError("Another request is already being profiled")
+        _active = cls()
+        _active.profile.enable()
+        return _active
+
+    def stop(self) -> None:
+        global _active
+        self.profile.disable()
+        if _active is self:
+            _active = None
+
+    def _offset(self, t: float) -> float:
+        return round((t - self.started) * 1000, 3)
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append({
+                "stage": name,
+                "start_ms": self._offset(start),
+                "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+            })
+
+    def track_task(self, task: asyncio.Task, name: str) -> None:
+        """Record when task finishes, relative to its creation."""
+        start = time.perf_counter()
+
+        def _done(t: asyncio.Task) -> None:
+            self.tasks.append({
+                "task": name,
+                "start_ms": self._offset(start),
+                "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+                "state": "cancelled" if t.cancelled() else ("failed" if t.exception() else "done"),
+            })
+
+        task.add_done_callback(_done)
+
+    def to_document(self, report_id: str, user_id: str) -> Dict:
+        """Serialize for the request_profiles collection."""
+        text = io.StringIO()
+        # Stats() takes over the profile's data, so serialize from it
+        stats = pstats.Stats(self.profile, stream=text)
+        stats.sort_stats("cumulative").print_stats(40)
+        return {
+            "report_id": report_id,
+            "user_id": user_id,
+            "created_at": datetime.utcnow(),
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "stages": self.stages,
+            "tasks": self.tasks,
+            "summary": text.getvalue(),
+            # Same format as pstats.dump_stats, loadable with pstats / snakeviz
+            "pstats": Binary(marshal.dumps(stats.stats)),
+        }
+
+
+def profile_stage(name: str):
+    """Time a pipeline stage if the current request is being profiled."""
+    profiler = current_profiler.get()
+    return profiler.stage(name) if profiler else contextlib.nullcontext()
+
+
+def track_task(task: asyncio.Task, name: str) -> None:
+    """Time an asyncio task if the current request is being profiled."""
+    profiler = current_profiler.get()
+    if profiler:
+        profiler.track_task(task, name)
@@ -0,0 +1,268 @@
+"""
+Per-user rate limiting and fair-share admission control.
+
+Two token buckets per user (requests, LLM tokens) sized by the user's tier,
+kept in process or in MongoDB when several workers must share them, plus a
+per-worker admission queue that hands free analysis slots to waiting users
+round-robin instead of first-come-first-served.
+"""
+import asyncio
+import contextlib
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Tuple
+
+from fastapi import Depends, HTTPException, status
+
+from ..config import settings
+from ..database.mongodb import get_database
+from ..models.user import UserInDB
+from .auth import get_current_user
+from .deadline import DeadlineExceeded
+from .metrics import metrics
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a user is over their limit; retry_after is in seconds."""
+
+    def __init__(self, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+def too_many_requests(exc: RateLimitExceeded) -> HTTPException:
+    """Convert a RateLimitExceeded into a 429 response."""
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=exc.detail,
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
+
+
+def get_tier_limits(user: UserInDB) -> Dict[str, int]:
+    """Limits for the user's tier, falling back to the default tier."""
+    tiers = settings.RATE_LIMIT_TIERS
+    return tiers.get(user.tier or settings.RATE_LIMIT_DEFAULT_TIER) or tiers[settings.RATE_LIMIT_DEFAULT_TIER]
+
+
+def _refill(tokens: float, updated_at: float, capacity: float, now: float) -> float:
+    """Token count after refilling at capacity-per-minute since updated_at."""
+    return min(capacity, tokens + (now - updated_at) * capacity / 60.0)
+
+
+class TokenBucket:
+    """Token bucket holding up to `capacity` tokens, refilled over one minute."""
+
+    def __init__(self, capacity: float):
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def consume(self, amount: float, force: bool = False) -> float:
+        """
+        Take amount tokens; return 0 on success, else seconds until possible.
+        With force the tokens are always taken (the bucket may go into debt),
+        and a negative amount refunds tokens.
+        """
+        now = time.monotonic()
+        self.tokens = _refill(self.tokens, self.updated_at, self.capacity, now)
+        self.updated_at = now
+        if force:
+            self.tokens = min(self.capacity, self.tokens - amount)
+            return 0.0
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0.0
+        return (amount - self.tokens) * 60.0 / self.capacity
+
+
+class MemoryBucketStore:
+    """Buckets kept in this process."""
+
+    def __init__(self):
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+
+    async def consume(
+        self, user_id: str, kind: str, capacity: float, amount: float, force: bool = False
+    ) -> float:
+        bucket = self._buckets.get((user_id, kind))
+        if bucket is None or bucket.capacity != capacity:
+            bucket = self._buckets[(user_id, kind)] = TokenBucket(capacity)
+        return bucket.consume(amount, force)
+
+
+class MongoBucketStore:
+    """Buckets shared through the rate_limits collection, updated optimistically."""
+
+    MAX_ATTEMPTS = 5
+
+    def _collection(self):
+        return get_database()["rate_limits"]
+
+    async def consume(
+        self, user_id: str, kind: str, capacity: float, amount: float, force: bool = False
+    ) -> float:
+        key = f"{user_id}:{kind}"
+        for _ in range(self.MAX_ATTEMPTS):
+            # Wall clock, since the documents are shared between processes
+            now = time.time()
+            doc = await self._collection().find_one({"_id": key})
+            if doc is None:
+                tokens, updated_at = capacity, None
+            else:
+                tokens = _refill(doc["tokens"], doc["updated_at"], capacity, now)
+                updated_at = doc["updated_at"]
+
+            if tokens < amount and not force:
+                return (amount - tokens) * 60.0 / capacity
+
+            new_doc = {"tokens": min(capacity, tokens - amount), "updated_at": now}
+            if updated_at is None:
+                result = await self._collection().update_one(
+                    {"_id": key}, {"$setOnInsert": new_doc}, upsert=True
+                )
+                if result.upserted_id is not None:
+                    return 0.0
+            else:
+                # Only succeeds if nobody else updated the bucket since we read it
+                result = await self._collection().update_one(
+                    {"_id": key, "updated_at": updated_at}, {"$set": new_doc}
+                )
+                if result.modified_count:
+                    return 0.0
+        # Heavy contention on this user's bucket: ask them to back off briefly
+        return 1.0
+
+
+class FairAdmission:
+    """
+    Limits concurrent analyses in this worker. When saturated, waiting
+    requests are queued per user and free slots are granted to users in
+    turn, so one user with many requests cannot starve the others.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._active = 0
+        # user_id -> that user's waiters, in round-robin order
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+
+    def _grant_next(self) -> None:
+        while self._queues and self._active < self.capacity:
+            user_id, waiters = next(iter(self._queues.items()))
+            waiter = waiters.popleft()
+            # Move this user to the back of the rotation (or drop them if done)
+            del self._queues[user_id]
+            if waiters:
+                self._queues[user_id] = waiters
+            if not waiter.done():
+                self._active += 1
+                waiter.set_result(None)
+
+    async def acquire(self, user_id: str, timeout: float, deadline_bound: bool = False) -> None:
+        """
+        Wait up to timeout for a slot. When deadline_bound is set the timeout
+        is the request's own deadline, so running out raises DeadlineExceeded
+        rather than a busy-service RateLimitExceeded.
+        """
+        if self._active < self.capacity and not self._queues:
+            self._active += 1
+            return
+
+        waiters = self._queues.setdefault(user_id, deque())
+        if len(waiters) >= settings.ADMISSION_MAX_QUEUED_PER_USER:
+            if not waiters:
+                del self._queues[user_id]
+            metrics.increment("admission_rejected_total")
+            raise RateLimitExceeded("Too many queued analyses", settings.ADMISSION_QUEUE_TIMEOUT_SECONDS)
+
+        waiter = asyncio.get_running_loop().create_future()
+        waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just as we gave up: hand the slot on
+                self.release()
+            else:
+                waiter.cancel()
+                with contextlib.suppress(ValueError):
+                    waiters.remove(waiter)
+                if not waiters and self._queues.get(user_id) is waiters:
+                    del self._queues[user_id]
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            if deadline_bound:
+                raise DeadlineExceeded("admission")
+            metrics.increment("admission_rejected_total")
+            raise RateLimitExceeded("Service is busy, try again later", timeout)
+
+    def release(self) -> None:
+        self._active -= 1
+        self._grant_next()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, user_id: str, timeout: float, deadline_bound: bool = False):
+        """Hold one analysis slot for the duration of the block."""
+        await self.acquire(user_id, timeout, deadline_bound)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class RateLimiter:
+    """Per-user request and LLM-token buckets."""
+
+    def __init__(self):
+        self.store = MongoBucketStore() if settings.RATE_LIMIT_BACKEND == "mongo" else MemoryBucketStore()
+
+    async def check_request(self, user: UserInDB) -> None:
+        """Count one request against the user's request bucket."""
+        capacity = get_tier_limits(user)["requests_per_minute"]
+        retry_after = await self.store.consume(user.id, "requests", capacity, 1)
+        if retry_after:
+            metrics.increment("rate_limited_requests_total")
+            raise RateLimitExceeded("Request rate limit exceeded", retry_after)
+
+    async def consume_llm_tokens(self, user: UserInDB, tokens: int) -> int:
+        """
+        Charge estimated LLM tokens against the user's token bucket before the
+        call. Returns the amount charged, to reconcile against actual usage.
+        """
+        capacity = get_tier_limits(user)["llm_tokens_per_minute"]
+        # A single request larger than the bucket just drains it
+        charged = min(tokens, capacity)
+        retry_after = await self.store.consume(user.id, "llm_tokens", capacity, charged)
+        if retry_after:
+            metrics.increment("rate_limited_llm_tokens_total")
+            raise RateLimitExceeded("LLM token quota exceeded", retry_after)
+        return charged
+
+    async def reconcile_llm_tokens(self, user: UserInDB, charged: int, used: int) -> None:
+        """
+        Settle the up-front estimate against the tokens the LLM reported
+        (prompt and output). Overruns put the bucket into debt; overestimates
+        are refunded.
+        """
+        if used <= 0 or used == charged:
+            return
+        capacity = get_tier_limits(user)["llm_tokens_per_minute"]
+        await self.store.consume(user.id, "llm_tokens", capacity, used - charged, force=True)
+
+
+rate_limiter = RateLimiter()
+admission = FairAdmission(settings.MAX_CONCURRENT_ANALYSES)
+
+
+async def get_rate_limited_user(current_user: UserInDB = Depends(get_current_user)) -> UserInDB:
+    """
+    Dependency: the current user, after charging one request to their bucket.
+    """
+    try:
+        await rate_limiter.check_request(current_user)
+    except RateLimitExceeded as e:
+        raise too_many_requests(e)
+    return current_user
@@ -0,0 +1,126 @@
+"""
+Retention for migration reports: TTL expiry, compaction and bulk deletes.
+
+All bulk work runs in batches of RETENTION_BATCH_SIZE documents and yields
+to the event loop between batches, so it never holds up request handling.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from pymongo.errors import PyMongoError
+
+from ..config import settings
+from ..database.mongodb import reports_collection, profiles_collection
+from ..models.report import Severity
+
+_CREATED_AT_INDEX = "created_at_1"
+INDEX_SETUP_RETRY_SECONDS = 10
+
+
+async def _ensure_created_at_index(collection, ttl: int) -> None:
+    """created_at index, carrying a TTL when ttl > 0 and plain otherwise."""
+    indexes = await collection.index_information()
+    existing = indexes.get(_CREATED_AT_INDEX)
+
+    if ttl > 0:
+        if existing and existing.get("expireAfterSeconds") is not None:
+            # Retention changed: update the TTL in place
+            await collection.database.command({
+                "collMod": collection.name,
+                "index": {"name": _CREATED_AT_INDEX, "expireAfterSeconds": ttl},
+            })
+            return
+        if existing:
+            await collection.drop_index(_CREATED_AT_INDEX)
+        await collection.create_index("created_at", name=_CREATED_AT_INDEX, expireAfterSeconds=ttl)
+    else:
+        if existing and existing.get("expireAfterSeconds") is not None:
+            await collection.drop_index(_CREATED_AT_INDEX)
+        await collection.create_index("created_at", name=_CREATED_AT_INDEX)
+
+
+async def ensure_report_indexes() -> None:
+    """
+    Create the report indexes. created_at carries the TTL when
+    REPORT_RETENTION_DAYS is set, on reports and on their request profiles.
+    """
+    ttl = settings.REPORT_RETENTION_DAYS * 24 * 3600
+    await reports_collection().create_index([("owner_id", 1), ("created_at", -1)])
+    await _ensure_created_at_index(reports_collection(), ttl)
+    await _ensure_created_at_index(profiles_collection(), ttl)
+    await profiles_collection().create_index("report_id")
+
+
+async def run_index_setup() -> None:
+    """Background job: create indexes, retrying until MongoDB is reachable."""
+    while True:
+        try:
+            await ensure_report_indexes()
+            return
+        except PyMongoError as e:
+            print(f"Index setup failed, retrying in {INDEX_SETUP_RETRY_SECONDS}s: {e}")
+            await asyncio.sleep(INDEX_SETUP_RETRY_SECONDS)
+
+
+def _compaction_pipeline() -> List[Dict[str, Any]]:
+    """Update pipeline replacing the issue list with per-severity counts."""
+    issues = {"$ifNull": ["$issues", []]}
+    return [
+        {"$set": {
+            "compacted": True,
+            "issues_count": {"$size": issues},
+            "severity_counts": {
+                sev.value: {"$size": {"$filter": {
+                    "input": issues,
+                    "cond": {"$eq": ["$$this.severity", sev.value]},
+                }}}
+                for sev in Severity
+            },
+        }},
+        {"$unset": "issues"},
+    ]
+
+
+async def compact_old_reports(older_than_days: int) -> int:
+    """Compact reports older than the given age. Returns how many were compacted."""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    query = {"created_at": {"$lt": cutoff}, "compacted": {"$ne": True}}
+    collection = reports_collection()
+    compacted = 0
+
+    while True:
+        ids = [d["_id"] async for d in collection.find(query, {"_id": 1}).limit(settings.RETENTION_BATCH_SIZE)]
+        if not ids:
+            return compacted
+        result = await collection.update_many({"_id": {"$in": ids}}, _compaction_pipeline())
+        compacted += result.modified_count
+        await asyncio.sleep(0)
+
+
+async def run_compaction_loop() -> None:
+    """Background job: compact old reports every COMPACTION_INTERVAL_SECONDS."""
+    while True:
+        try:
+            count = await compact_old_reports(settings.REPORT_COMPACTION_DAYS)
+            if count:
+                print(f"Compacted {count} reports older than {settings.REPORT_COMPACTION_DAYS} days")
+        except PyMongoError as e:
+            print(f"Report compaction failed: {e}")
+        await asyncio.sleep(settings.COMPACTION_INTERVAL_SECONDS)
+
+
+async def delete_reports(query: Dict[str, Any]) -> int:
+    """Delete every report matching query, batch by batch, with their profiles."""
+    collection = reports_collection()
+    deleted = 0
+
+    while True:
+        ids = [d["_id"] async for d in collection.find(query, {"_id": 1}).limit(settings.RETENTION_BATCH_SIZE)]
+        if not ids:
+            print(f"Bulk delete removed {deleted} reports")
+            return deleted
+        result = await collection.delete_many({"_id": {"$in": ids}})
+        await profiles_collection().delete_many({"report_id": {"$in": [str(i) for i in ids]}})
+        deleted += result.deleted_count
+        await asyncio.sleep(0)
@@ -0,0 +1,96 @@
+"""
+Event-loop lag under concurrent large zip uploads.
+
+Runs FileProcessor.process_upload on several large archives at once while a
+probe task measures how late the event loop wakes it up. Compares extraction
+inline on the loop (CPU_POOL_WORKERS=0, the old behaviour) with the process pool.
+
+Usage (from backend/):
+    python -m benchmarks.event_loop_lag [--uploads 4] [--files 400] [--workers 2]
+"""
+import argparse
+import asyncio
+import io
+import random
+import string
+import time
+import zipfile
+
+from starlette.datastructures import UploadFile
+
+from app.config import settings
+from app.services.cpu_pool import get_cpu_pool, shutdown_cpu_pool
+from app.services.file_processor import FileProcessor
+
+PROBE_INTERVAL = 0.005
+
+
+def make_zip(n_files: int, seed: int) -> bytes:
+    """Build a zip of Python-2-ish sources that does not compress too well."""
+    rng = random.Random(seed)
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for i in range(n_files):
+            lines = []
+            for _ in range(600):
+                name = "".join(rng.choices(string.ascii_lowercase, k=12))
+                lines.append(f"{name} = dict.has_key({rng.randint(0, 10**9)})  # {name.upper()}")
+            zf.writestr(f"pkg/module_{i}.py", "\n".join(lines))
+    return buf.getvalue()
+
+
+async def probe(stop: asyncio.Event, lags: list) -> None:
+    """Record how much later than requested each short sleep returns."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - start - PROBE_INTERVAL)
+
+
+async def run(archives: list) -> dict:
+    processor = FileProcessor()
+    get_cpu_pool()  # start workers outside the measured window
+    if settings.CPU_POOL_WORKERS > 0:
+        await processor.process_upload(UploadFile(io.BytesIO(archives[0]), filename="warmup.zip"))
+
+    stop, lags = asyncio.Event(), []
+    probe_task = asyncio.create_task(probe(stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        processor.process_upload(UploadFile(io.BytesIO(data), filename=f"upload_{i}.zip"))
+        for i, data in enumerate(archives)
+    ))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe_task
+
+    lags.sort()
+    return {
+        "wall_s": elapsed,
+        "max_lag_ms": lags[-1] * 1000,
+        "p99_lag_ms": lags[int(len(lags) * 0.99) - 1] * 1000 if len(lags) > 1 else lags[-1] * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--uploads", type=int, default=4)
+    parser.add_argument("--files", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    archives = [make_zip(args.files, seed) for seed in range(args.uploads)]
+    print(f"{args.uploads} concurrent uploads, "
+          f"{sum(map(len, archives)) / args.uploads / 1e6:.1f}MB compressed each")
+    settings.MAX_FILE_SIZE = max(settings.MAX_FILE_SIZE, max(map(len, archives)))
+
+    print(f"{'mode':<12}{'wall (s)':>10}{'max lag (ms)':>15}{'p99 lag (ms)':>15}")
+    for mode, workers in (("inline", 0), ("pool", args.workers)):
+        settings.CPU_POOL_WORKERS = workers
+        result = asyncio.run(run(archives))
+        shutdown_cpu_pool()
+        print(f"{mode:<12}{result['wall_s']:>10.2f}{result['max_lag_ms']:>15.1f}{result['p99_lag_ms']:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,15 @@ FastAPI application entry point.
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 
 from app.config import settings
 from app.database.mongodb import connect_to_mongodb, close_mongodb_connection
 from app.routes.migration import router as migration_router
 from app.routes.auth import router as auth_router
+from app.services.cpu_pool import get_cpu_pool, shutdown_cpu_pool
+from app.services.metrics import metrics
+from app.services.retention import run_index_setup, run_compaction_loop
 
 
 @asynccontextmanager
@@ -16,8 +20,16 @@ async def lifespan(app: FastAPI):
     """Application lifespan manager for startup and shutdown events."""
     # Startup
     await connect_to_mongodb()
+    # Index setup must not block startup while MongoDB is still coming up
+    background = [asyncio.create_task(run_index_setup())]
+    get_cpu_pool()
+    if settings.REPORT_COMPACTION_DAYS > 0:
+        background.append(asyncio.create_task(run_compaction_loop()))
     yield
     # Shutdown
+    for task in background:
+        task.cancel()
+    shutdown_cpu_pool()
     await close_mongodb_connection()
 
 
@@ -62,3 +74,9 @@ async def root():
 async def health_check():
     """Health check endpoint for container orchestration."""
     return {"status": "healthy"}
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Operational counters (cancellations, deadline expiries, partial reports)."""
+    return metrics.snapshot()
@@ -0,0 +1,7 @@
+"""
+Shared pytest setup: make the backend's `app` package importable.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
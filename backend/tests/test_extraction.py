@@ -0,0 +1,56 @@
+"""
+Tests for the streaming tar extractor.
+"""
+import io
+import tarfile
+
+import pytest
+
+from app.services.extraction import iter_tar_sources, read_streamed_sources
+
+MAX_SIZE = 10 * 1024 * 1024
+MAX_EXTRACTED = 1024 * 1024
+
+
+def _tar(members, mode="w:gz"):
+    """Build a tar archive in memory from {name: bytes}."""
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode=mode) as tf:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize("mode", ["w", "w:gz", "w:xz"])
+def test_reads_python_members(mode):
+    data = _tar({"pkg/a.py": b"print 'hi'\n", "README.txt": b"docs", "pkg/__pycache__/a.py": b"x"}, mode)
+    files = read_streamed_sources(io.BytesIO(data), iter_tar_sources, MAX_SIZE, MAX_EXTRACTED)
+    assert files == [{"filename": "pkg/a.py", "content": "print 'hi'\n"}]
+
+
+def test_decodes_pep263_cookie():
+    source = "# -*- coding: latin-1 -*-\nname = 'é'\n"
+    data = _tar({"a.py": source.encode("latin-1")})
+    files = read_streamed_sources(io.BytesIO(data), iter_tar_sources, MAX_SIZE, MAX_EXTRACTED)
+    assert files[0]["content"] == source
+
+
+def test_skipped_members_count_against_extracted_limit():
+    # Small compressed, but streaming past big.bin still decompresses all of it
+    data = _tar({"big.bin": b"\0" * (4 * MAX_EXTRACTED), "a.py": b"x = 1\n"})
+    assert len(data) < MAX_EXTRACTED // 10
+    with pytest.raises(ValueError, match="maximum extracted size"):
+        read_streamed_sources(io.BytesIO(data), iter_tar_sources, MAX_SIZE, MAX_EXTRACTED)
+
+
+def test_upload_size_limit():
+    data = _tar({"a.py": b"x = 1\n"}, mode="w")
+    with pytest.raises(ValueError, match="upload limit"):
+        read_streamed_sources(io.BytesIO(data), iter_tar_sources, 1024, MAX_EXTRACTED)
+
+
+def test_invalid_archive():
+    with pytest.raises(ValueError, match="Invalid tar archive"):
+        read_streamed_sources(io.BytesIO(b"not a tarball" * 100), iter_tar_sources, MAX_SIZE, MAX_EXTRACTED)
@@ -0,0 +1,190 @@
+"""
+Tests for the offline git bundle reader, using bundles made by real git.
+"""
+import hashlib
+import io
+import shutil
+import subprocess
+import zlib
+
+import pytest
+
+from app.services import git_bundle
+from app.services.extraction import iter_bundle_sources, read_streamed_sources
+
+MAX_SIZE = 10 * 1024 * 1024
+MAX_EXTRACTED = 50 * 1024 * 1024
+
+needs_git = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+
+def _git(repo, *args):
+    subprocess.run(
+        ["git", "-c", "user.name=t", "-c", "user.email=t@example.com", *args],
+        cwd=repo, check=True, capture_output=True,
+    )
+
+
+def _module(revision, lines=400):
+    """A Python file that changes only slightly between revisions, so git deltifies it."""
+    body = "\n".join(f"value_{i} = dict.has_key({i})" for i in range(lines))
+    return f"{body}\n# revision {revision}\n"
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """A repository with several revisions of the same files."""
+    path = tmp_path / "repo"
+    path.mkdir()
+    _git(path, "init", "-q", "-b", "master")
+    (path / "pkg").mkdir()
+    for revision in range(4):
+        for n in range(3):
+            (path / "pkg" / f"mod{n}.py").write_text(_module(revision))
+        (path / "README.txt").write_text(f"readme {revision}\n")
+        _git(path, "add", "-A")
+        _git(path, "commit", "-q", "-m", f"revision {revision}")
+    return path
+
+
+def _bundle(repo, *revs):
+    out = repo.parent / "out.bundle"
+    _git(repo, "bundle", "create", str(out), *revs)
+    return out.read_bytes()
+
+
+def _read(data, max_extracted=MAX_EXTRACTED):
+    files = read_streamed_sources(io.BytesIO(data), iter_bundle_sources, MAX_SIZE, max_extracted)
+    return {f["filename"]: f["content"] for f in files}
+
+
+@needs_git
+def test_full_bundle(repo):
+    files = _read(_bundle(repo, "--all"))
+    assert sorted(files) == ["pkg/mod0.py", "pkg/mod1.py", "pkg/mod2.py"]
+    for name, content in files.items():
+        assert content == (repo / name).read_text()
+
+
+@needs_git
+def test_bundle_with_deltas(repo, monkeypatch):
+    applied = []
+    original = git_bundle._apply_delta
+
+    def counting_apply(base, delta):
+        applied.append(len(delta))
+        return original(base, delta)
+
+    monkeypatch.setattr(git_bundle, "_apply_delta", counting_apply)
+    files = _read(_bundle(repo, "--all"))
+    assert applied, "expected git to store some objects as deltas"
+    assert files["pkg/mod0.py"] == _module(3)
+
+
+@needs_git
+def test_annotated_tag_head(repo):
+    _git(repo, "tag", "-a", "v1", "-m", "release")
+    files = _read(_bundle(repo, "v1"))
+    assert files["pkg/mod1.py"] == _module(3)
+
+
+@needs_git
+def test_incremental_bundle_is_rejected(repo):
+    data = _bundle(repo, "HEAD~1..master")
+    with pytest.raises(ValueError, match="prerequisite commits are not supported"):
+        _read(data)
+
+
+@needs_git
+def test_truncated_bundle(repo):
+    data = _bundle(repo, "--all")
+    with pytest.raises(ValueError):
+        _read(data[: len(data) // 2])
+
+
+@needs_git
+def test_corrupt_pack(repo):
+    data = bytearray(_bundle(repo, "--all"))
+    pack = data.index(b"PACK")
+    # Damage the compressed object data past the pack header
+    for i in range(pack + 40, len(data) - 40, 97):
+        data[i] ^= 0xFF
+    with pytest.raises(ValueError):
+        _read(bytes(data))
+
+
+@needs_git
+def test_extracted_size_limit(repo):
+    with pytest.raises(ValueError, match="maximum extracted size"):
+        _read(_bundle(repo, "--all"), max_extracted=4096)
+
+
+def test_not_a_bundle():
+    with pytest.raises(ValueError, match="Not a git bundle"):
+        _read(b"PK\x03\x04 definitely a zip\n")
+
+
+# Hand-built packs for cases real git will not produce
+
+def _varint(n):
+    out = bytearray()
+    while True:
+        byte, n = n & 0x7F, n >> 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _obj_header(obj_type, size):
+    c, size = (obj_type << 4) | (size & 0x0F), size >> 4
+    out = bytearray()
+    while size:
+        out.append(c | 0x80)
+        c, size = size & 0x7F, size >> 7
+    out.append(c)
+    return bytes(out)
+
+
+def _oid(obj_type, data):
+    return hashlib.sha1(b"%s %d\0" % (git_bundle._TYPE_NAMES[obj_type], len(data)) + data).digest()
+
+
+def _pack_bundle(head, entries):
+    """Bundle from (type, data[, base oid]) entries, pointing HEAD at head."""
+    pack = b"PACK" + (2).to_bytes(4, "big") + len(entries).to_bytes(4, "big")
+    for obj_type, data, *base in entries:
+        pack += _obj_header(obj_type, len(data)) + (base[0] if base else b"") + zlib.compress(data)
+    pack += hashlib.sha1(pack).digest()
+    return b"# v2 git bundle\n" + head.hex().encode() + b" HEAD\n\n" + pack
+
+
+def test_repeated_copy_delta_bomb():
+    blob = b"a" * 65536
+    for declared in (2000 * 65536, 65536):
+        # 2000 one-byte copy ops, each copying 64KB of the base
+        delta = _varint(len(blob)) + _varint(declared) + b"\x80" * 2000
+        data = _pack_bundle(b"\0" * 20, [
+            (git_bundle._BLOB, blob),
+            (git_bundle._REF_DELTA, delta, _oid(git_bundle._BLOB, blob)),
+        ])
+        assert len(data) < 1024
+        with pytest.raises(ValueError):
+            _read(data)
+
+
+def test_deeply_nested_tree():
+    blob = b"x = 1\n"
+    entries = [(git_bundle._BLOB, blob)]
+    oid, mode, name = _oid(git_bundle._BLOB, blob), b"100644", b"deep.py"
+    depth = 3000
+    for _ in range(depth):
+        tree = mode + b" " + name + b"\0" + oid
+        entries.append((git_bundle._TREE, tree))
+        oid, mode, name = _oid(git_bundle._TREE, tree), b"40000", b"d"
+    commit = b"tree " + oid.hex().encode() + b"\nauthor t\n\nmsg\n"
+    entries.append((git_bundle._COMMIT, commit))
+
+    files = _read(_pack_bundle(_oid(git_bundle._COMMIT, commit), entries))
+    assert files == {"d/" * (depth - 1) + "deep.py": "x = 1\n"}
@@ -5,11 +5,16 @@ function AnalysisResults({ report }) {
     return `severity-${severity}`
   }
 
+  // Compacted reports (retention policy) keep only counts, not issue details
+  const issueCount = report.compacted ? report.issues_count || 0 : report.issues?.length || 0
+  const highCount = report.compacted
+    ? report.severity_counts?.high || 0
+    : report.issues?.filter(i => i.severity === 'high').length || 0
+
   const getStatusBadge = () => {
     if (report.is_valid_python3) {
       return { class: 'success', text: '✅ Valid Python 3' }
     }
-    const issueCount = report.issues?.length || 0
     if (issueCount === 0) {
       return { class: 'success', text: 'No Issues Found' }
     }
@@ -34,13 +39,11 @@ function AnalysisResults({ report }) {
             <span className="stat-label">Files Analyzed</span>
           </div>
           <div className="stat">
-            <span className="stat-value">{report.issues?.length || 0}</span>
+            <span className="stat-value">{issueCount}</span>
             <span className="stat-label">Issues Found</span>
           </div>
           <div className="stat">
-            <span className="stat-value">
-              {report.issues?.filter(i => i.severity === 'high').length || 0}
-            </span>
+            <span className="stat-value">{highCount}</span>
             <span className="stat-label">High Severity</span>
           </div>
         </div>
@@ -80,8 +83,19 @@ function AnalysisResults({ report }) {
         </div>
       )}
 
+      {/* Compacted Report Message */}
+      {report.compacted && issueCount > 0 && (
+        <div className="summary-section">
+          <h3>Detected Issues</h3>
+          <p>
+            Issue details for this report were removed by the retention policy.
+            Only the counts above are kept.
+          </p>
+        </div>
+      )}
+
       {/* No Issues Message */}
-      {(!report.issues || report.issues.length === 0) && (
+      {issueCount === 0 && (
         <div className="no-issues">
           <div className="no-issues-icon">🎉</div>
           <p>No compatibility issues found! Your code appears to be Python 3 compatible.</p>
@@ -28,7 +28,7 @@ function FileUpload({ onFileSelect, selectedFile }) {
   }
 
   const isValidFile = (file) => {
-    const validExtensions = ['.py', '.zip']
+    const validExtensions = ['.py', '.zip', '.tar', '.tar.gz', '.tgz', '.tar.xz', '.txz', '.bundle']
     return validExtensions.some(ext => file.name.toLowerCase().endsWith(ext))
   }
 
@@ -62,7 +62,7 @@ function FileUpload({ onFileSelect, selectedFile }) {
         <div className="upload-prompt">
           <div className="upload-icon">📁</div>
           <p className="upload-text">
-            Drag and drop a <strong>.py</strong> file or <strong>.zip</strong> archive
+            Drag and drop a <strong>.py</strong> file, a <strong>.zip</strong> / <strong>.tar.gz</strong> archive or a git <strong>.bundle</strong>
           </p>
           <p className="upload-or">or</p>
           <button type="button" className="browse-button" onClick={handleBrowseClick}>
@@ -71,7 +71,7 @@ function FileUpload({ onFileSelect, selectedFile }) {
           <input
             ref={fileInputRef}
             type="file"
-            accept=".py,.zip"
+            accept=".py,.zip,.tar,.gz,.tgz,.xz,.txz,.bundle"
             onChange={handleFileInput}
             style={{ display: 'none' }}
           />